@@ -6,15 +6,18 @@ Runs the target script in a heavily restricted environment.
 - Sets a wall-clock alarm
 - Replaces builtins to disable file I/O and restrict imports
 - Disables networking while keeping socket/ssl attributes
-- Loads injected_dfs.pkl (if present) and injects as variable `dfs`
+- Loads the injected_dfs.arrow bundle (if present) and injects as variable `dfs`
 """
 
 import sys
 import os
+import errno
 import signal
 import resource
 import types
-import pickle
+import builtins as _builtins
+import socket as _real_socket
+import ssl as _real_ssl
 
 # Child tunables
 CPU_TIME_SECONDS = 3
@@ -22,12 +25,26 @@ MEMORY_BYTES = 200 * 1024 * 1024  # ~200MB
 ALARM_SECONDS = 10
 
 # Allowed top-level modules (whitelist)
-ALLOWED_MODULES = {
+ALLOWED_MODULES = frozenset({
     "math", "json", "re", "itertools", "functools", "random", "statistics",
     "string", "collections", "heapq", "bisect", "datetime",
-    "pandas", "numpy", "matplotlib","openai"
+    "pandas", "numpy", "matplotlib","openai","pyarrow","orjson"
+})
+
+# restricted_import runs for every import the sandboxed code performs,
+# including the long transitive chains under pandas/matplotlib. Bucket the
+# whitelist by first letter so most lookups screen against a tiny frozenset.
+_EMPTY = frozenset()
+_MODHEAD = {
+    c: frozenset(n for n in ALLOWED_MODULES if n[0] == c)
+    for c in {n[0] for n in ALLOWED_MODULES}
 }
 
+# socket/ssl module contents are constant per interpreter; snapshot them once
+# so disable_networking() is a single dict merge instead of per-attr getattr/setattr
+_SOCKET_ATTRS = tuple(_real_socket.__dict__.items())
+_SSL_ATTRS = tuple(_real_ssl.__dict__.items())
+
 def hard_limits():
     try:
         resource.setrlimit(resource.RLIMIT_CPU, (CPU_TIME_SECONDS, CPU_TIME_SECONDS + 1))
@@ -46,8 +63,6 @@ def disable_networking():
     Replace socket and ssl in sys.modules with wrappers that preserve
     constants/classes but raise on operations that would perform networking.
     """
-    import socket as real_socket
-    import ssl as real_ssl
     import sys as _sys
 
     def _raise(*a, **k):
@@ -55,11 +70,7 @@ def disable_networking():
 
     # --- fake socket: copy attributes but block connect/socket creation ---
     fake_socket = types.ModuleType("socket")
-    for attr in dir(real_socket):
-        try:
-            setattr(fake_socket, attr, getattr(real_socket, attr))
-        except Exception:
-            pass
+    fake_socket.__dict__.update(_SOCKET_ATTRS)
     for func in ("socket", "create_connection", "getaddrinfo", "gethostbyname", "gethostbyaddr", "getnameinfo"):
         try:
             setattr(fake_socket, func, _raise)
@@ -69,55 +80,91 @@ def disable_networking():
 
     # --- fake ssl: copy attributes; block wrap_socket and network-y methods ---
     fake_ssl = types.ModuleType("ssl")
-    for attr in dir(real_ssl):
-        try:
-            setattr(fake_ssl, attr, getattr(real_ssl, attr))
-        except Exception:
-            pass
+    fake_ssl.__dict__.update(_SSL_ATTRS)
     try:
         # make wrap_socket raise
         fake_ssl.wrap_socket = lambda *a, **k: (_ for _ in ()).throw(RuntimeError("ssl disabled"))
         # keep create_default_context but make context not open sockets
         def _create_default_context(*a, **k):
             # return a real SSLContext but network ops are blocked by socket replacement
-            return real_ssl.SSLContext(real_ssl.PROTOCOL_TLS_CLIENT)
+            return _real_ssl.SSLContext(_real_ssl.PROTOCOL_TLS_CLIENT)
         fake_ssl.create_default_context = _create_default_context
     except Exception:
         pass
     _sys.modules["ssl"] = fake_ssl
 
-def make_safe_builtins():
-    import builtins as _builtins
-    allowed = [
-        # safe builtins list (no file/network execution)
-        "abs","all","any","ascii","bin","bool","bytearray","bytes",
-        "chr","complex","dict","divmod","enumerate","filter","float","format",
-        "frozenset","hash","hex","id","int","isinstance","issubclass","iter",
-        "len","list","map","max","min","next","object","oct","ord","pow",
-        "print","range","repr","reversed","round","set","slice","sorted",
-        "str","sum","tuple","zip",
-        # exceptions
-        "BaseException","Exception","StopIteration","ArithmeticError","LookupError",
-    ]
-    safe = {name: getattr(_builtins, name) for name in allowed if hasattr(_builtins, name)}
+_ALLOWED_BUILTINS = (
+    # safe builtins list (no file/network execution)
+    "abs","all","any","ascii","bin","bool","bytearray","bytes",
+    "chr","complex","dict","divmod","enumerate","filter","float","format",
+    "frozenset","hash","hex","id","int","isinstance","issubclass","iter",
+    "len","list","map","max","min","next","object","oct","ord","pow",
+    "print","range","repr","reversed","round","set","slice","sorted",
+    "str","sum","tuple","zip",
+    # exceptions
+    "BaseException","Exception","StopIteration","ArithmeticError","LookupError",
+)
+_SAFE_BUILTINS_TEMPLATE = {
+    name: getattr(_builtins, name) for name in _ALLOWED_BUILTINS if hasattr(_builtins, name)
+}
+
+def apply_seccomp():
+    """
+    Kernel-level backstop for disable_networking: C extensions (numpy,
+    matplotlib, ...) can call libc directly and never see the patched
+    socket/ssl modules. When libseccomp bindings are available, install a
+    BPF filter that fails network syscalls with EPERM — enforcement then
+    costs tens of ns per syscall in-kernel instead of relying on
+    Python-level attribute replacement. No-op if pyseccomp is missing.
+    """
+    try:
+        import pyseccomp
+    except ImportError:
+        return False
+    try:
+        filt = pyseccomp.SyscallFilter(defaction=pyseccomp.ALLOW)
+        deny = pyseccomp.ERRNO(errno.EPERM)
+        for name in ("socket", "socketpair", "connect", "accept", "accept4",
+                     "bind", "listen", "sendto", "recvfrom", "sendmsg", "recvmsg"):
+            try:
+                filt.add_rule(deny, name)
+            except Exception:
+                pass
+        filt.load()
+        return True
+    except Exception:
+        return False
 
+def make_safe_builtins():
     def blocked_open(*args, **kwargs):
         raise PermissionError("file IO is disabled in sandbox")
 
     def restricted_import(name, globals=None, locals=None, fromlist=(), level=0):
-        root = name.split(".")[0]
-        if root in ALLOWED_MODULES:
+        root = name.partition(".")[0]
+        if root in _MODHEAD.get(root[:1], _EMPTY):
             return __import__(name, globals or {}, locals or {}, fromlist, level)
         raise ImportError(f"import of '{name}' not allowed in sandbox")
 
+    safe = _SAFE_BUILTINS_TEMPLATE.copy()
     safe["open"] = blocked_open
     safe["__import__"] = restricted_import
     return safe
 
-def clear_environment():
-    for k in list(os.environ.keys()):
-        if k.startswith("LD_") or k in ("PYTHONPATH","PYTHONHOME"):
-            del os.environ[k]
+def load_injected(inject_dir):
+    """Read the Feather bundle written by prepare_injection.py back into
+    a list of (name, df) tuples."""
+    # imported here, not at module top: pyarrow (and the pandas it pulls in)
+    # costs hundreds of ms, and targets without injected data never need it
+    import orjson
+    import pyarrow.feather as feather
+
+    with open(os.path.join(inject_dir, "manifest.json"), "rb") as fh:
+        manifest = orjson.loads(fh.read())
+    dfs = []
+    for entry in manifest:
+        table = feather.read_table(os.path.join(inject_dir, entry["file"]))
+        dfs.append((entry["name"], table.to_pandas(self_destruct=True)))
+    return dfs
 
 def run_target(target_path):
     # read source
@@ -127,10 +174,9 @@ def run_target(target_path):
     # attempt to load injected dfs (while file I/O still allowed)
     injected_dfs = None
     try:
-        inject_path = os.path.join(os.path.dirname(target_path), "injected_dfs.pkl")
-        if os.path.exists(inject_path):
-            with open(inject_path, "rb") as fh:
-                injected_dfs = pickle.load(fh)
+        inject_path = os.path.join(os.path.dirname(target_path), "injected_dfs.arrow")
+        if os.path.isdir(inject_path):
+            injected_dfs = load_injected(inject_path)
     except Exception:
         injected_dfs = None
 
@@ -160,8 +206,13 @@ def main():
     signal.signal(signal.SIGALRM, alarm_handler)
     signal.alarm(ALARM_SECONDS)
 
-    clear_environment()
+    # env filtering (LD_*, PYTHONPATH, PYTHONHOME) happens in sandbox.py via
+    # subprocess env=, so the child starts clean without unsetenv churn
     disable_networking()
+    # file reads (target script, injection bundle) still happen after this
+    # point, so only network syscalls are denied here; file IO stays blocked
+    # at the builtins layer
+    apply_seccomp()
 
     # change to minimal tmp dir
     try:
@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
 import os
+import re
+import hashlib
+import itertools
 import streamlit as st
 import gspread
+import orjson
 import pandas as pd
 from dotenv import load_dotenv
 from openai import OpenAIError
@@ -36,77 +40,123 @@ if not OPENROUTER_API_KEY:
     st.stop()
 
 # ---- DeepSeek/OpenRouter call ----
-def call_llm(prompt, model="mistralai/mistral-7b-instruct"):
-    headers = {
+@st.cache_resource
+def http_session():
+    # one pooled session so the TCP+TLS handshake amortizes across questions;
+    # cache_resource keeps it alive across reruns — a module-level session
+    # would be rebuilt (and its connections dropped) on every rerun
+    session = requests.Session()
+    session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4))
+    session.headers.update({
         "Authorization": f"Bearer {OPENROUTER_API_KEY}",
         "Content-Type": "application/json"
-    }
+    })
+    return session
+
+@st.cache_data(show_spinner=False)
+def call_llm(prompt, model="mistralai/mistral-7b-instruct"):
+    # raise on failure instead of returning an error string: st.cache_data
+    # caches return values but not exceptions, so a transient API error is
+    # retried on resubmit rather than cached per-prompt forever
     data = {
         "model": model,
         "messages": [{"role": "user", "content": prompt}],
         "temperature": 0.3
     }
-    try:
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers, json=data
-        )
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"].strip()
-    except requests.exceptions.RequestException as e:
-        return f"❌ API request error: {e}"
-    except Exception as e:
-        return f"❌ Unexpected error: {e}"
+    response = http_session().post(
+        "https://openrouter.ai/api/v1/chat/completions",
+        json=data, timeout=30
+    )
+    response.raise_for_status()
+    return response.json()["choices"][0]["message"]["content"].strip()
 
 # ---- If no injected dfs, load from Google Sheets ----
+@st.cache_resource
+def sheets_client():
+    return gspread.service_account_from_dict(orjson.loads(SERVICE_ACCOUNT_JSON))
+
+@st.cache_data(show_spinner="Loading Google Sheets…")
+def load_sheet(sid):
+    # cached per sheet id so Streamlit reruns (every widget change) don't
+    # re-fetch it; failures raise and are therefore *not* cached — a sheet
+    # that failed once is retried on the next rerun
+    sh = sheets_client().open_by_key(sid)
+    loaded, skipped = [], []
+    for ws in sh.worksheets():
+        values = ws.get_all_values()
+        if not values or len(values) < 2:
+            continue
+        header = [str(c).strip() for c in values[0]]
+        # dict-based construction collapses duplicate header names, so skip
+        # such sheets up front (same guard as prepare_injection) and report
+        # them to the caller rather than vanishing silently
+        if len(set(header)) != len(header) or '' in header:
+            skipped.append(ws.title)
+            continue
+        # build columns directly (pandas' native layout); pad ragged rows
+        cols = itertools.zip_longest(*values[1:], fillvalue=None)
+        df = pd.DataFrame(dict(zip(header, cols)))
+        if not df.empty:
+            loaded.append((sh.title + " → " + ws.title, df))
+    return sh.title, loaded, skipped
+
 if not dfs:
-    try:
-        gc = gspread.service_account_from_dict(eval(SERVICE_ACCOUNT_JSON))
-        sheet_ids = st.text_area(
-            "📎 Enter comma-separated Google Sheet IDs:",
-            placeholder="1abcXyz..., 1defPqr..."
-        )
-        if sheet_ids.strip():
-            for sid in [s.strip() for s in sheet_ids.split(",") if s.strip()]:
-                try:
-                    sh = gc.open_by_key(sid)
-                    st.success(f"📄 Opened: {sh.title}")
-                    for ws in sh.worksheets():
-                        values = ws.get_all_values()
-                        if not values or len(values) < 2:
-                            continue
-                        header = [str(c).strip() for c in values[0]]
-                        rows = [r for r in values[1:] if len(r) == len(header)]
-                        df = pd.DataFrame(rows, columns=header)
-                        if not df.empty:
-                            dfs.append((sh.title + " → " + ws.title, df))
-                except Exception as e:
-                    st.error(f"❌ Could not open sheet {sid}: {e}")
-    except Exception as e:
-        st.error(f"❌ Google Sheets auth failed: {e}")
-        st.stop()
+    sheet_ids = st.text_area(
+        "📎 Enter comma-separated Google Sheet IDs:",
+        placeholder="1abcXyz..., 1defPqr..."
+    )
+    if sheet_ids.strip():
+        try:
+            sheets_client()
+        except Exception as e:
+            st.error(f"❌ Google Sheets auth failed: {e}")
+            st.stop()
+        for sid in [s.strip() for s in sheet_ids.split(",") if s.strip()]:
+            try:
+                title, loaded, skipped = load_sheet(sid)
+            except Exception as e:
+                st.error(f"❌ Could not open sheet {sid}: {e}")
+                continue
+            st.success(f"📄 Opened: {title}")
+            for ws_title in skipped:
+                st.warning(f"⚠️ Skipping {ws_title}: duplicate/empty header")
+            dfs.extend(loaded)
 
 if not dfs:
     st.warning("⚠️ No dataframes loaded.")
     st.stop()
 
 # ---- Show loaded data ----
+# one tab per sheet instead of a stacked list: each st.dataframe call
+# Arrow-serializes its frame to the browser, so keep the previews compact
 st.subheader("🗃️ Available Data")
-for name, df in dfs:
-    st.markdown(f"**{name}**")
-    st.dataframe(df.head(3), use_container_width=True)
+tabs = st.tabs([name for name, _ in dfs])
+for tab, (name, df) in zip(tabs, dfs):
+    with tab:
+        st.dataframe(df.head(3), use_container_width=True)
 
 # ---- Ask a question ----
 st.subheader("💬 Ask a question about your data")
 query = st.text_input("Ask a question (e.g., 'Total expense in August')")
 
-def ask_llm_for_code(question, dfs):
-    schema_parts = []
-    for name, df in dfs:
-        schema_parts.append(
+# schema/sample markdown per dataframe is invariant for the session; cache it
+# in session_state (module globals reset on every rerun) so re-asked
+# questions skip the to_markdown render
+def _schema_part(name, df):
+    cache = st.session_state.setdefault("_schema_cache", {})
+    key = (name, tuple(df.columns), len(df))
+    part = cache.get(key)
+    if part is None:
+        part = (
             f"### {name}\nColumns: {list(df.columns)}\nSample:\n{df.head(5).to_markdown(index=False)}"
         )
-    schema = "\n\n".join(schema_parts)
+        cache[key] = part
+    return part
+
+def ask_llm_for_code(question, dfs):
+    # no extra cache here: call_llm is st.cache_data-cached per prompt, which
+    # already serves a repeat question without the network round-trip
+    schema = "\n\n".join(_schema_part(name, df) for name, df in dfs)
     prompt = f"""
 You are a Python data analyst.
 Given the following table schemas and sample data, write Python Pandas code to answer the question.
@@ -123,17 +173,34 @@ Question:
 """
     return call_llm(prompt)
 
+_BANNED_RE = re.compile(
+    r"import|os\.|system\(|open\(|eval\(|exec\(|subprocess", re.IGNORECASE
+)
+
 def is_safe_code(code):
-    banned = ["import", "os.", "system(", "open(", "eval(", "exec(", "subprocess"]
-    return not any(b in code.lower() for b in banned)
+    return _BANNED_RE.search(code) is None
 
 def run_query(question, dfs):
-    code = ask_llm_for_code(question, dfs)
+    try:
+        code = ask_llm_for_code(question, dfs)
+    except requests.exceptions.RequestException as e:
+        return f"❌ API request error: {e}", ""
+    except Exception as e:
+        return f"❌ Unexpected error: {e}", ""
     if not is_safe_code(code):
         return "⚠️ Unsafe code generated.", code
     try:
+        # compiled code objects keyed by source hash, held in session_state:
+        # module globals are rebuilt on every Streamlit rerun, so a plain
+        # dict here would never see a second lookup
+        code_cache = st.session_state.setdefault("_code_cache", {})
+        key = hashlib.blake2b(code.encode(), digest_size=16).digest()
+        co = code_cache.get(key)
+        if co is None:
+            co = compile(code, "<llm>", "exec")
+            code_cache[key] = co
         local_vars = {"dfs": dfs}
-        exec(code, {}, local_vars)
+        exec(co, {}, local_vars)
         return local_vars.get("result", "⚠️ No result variable."), code
     except Exception as e:
         return f"⚠️ Error running code: {e}", code
@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
 """
 prepare_injection.py
-Create injected_dfs.pkl from Google Sheets or local Excel.
+Create an injected_dfs.arrow bundle from Google Sheets or local Excel.
+
+The bundle is a directory holding one Feather (Arrow IPC) file per worksheet
+plus a manifest.json listing (name, file) pairs. Feather preserves dtypes and
+lets the sandbox read columns back without rebuilding each cell as a Python
+object.
 
 Usage:
   # from Google Sheets (trusted env; set GOOGLE_SERVICE_ACCOUNT JSON in env or .env)
@@ -11,30 +16,76 @@ Usage:
   python3 prepare_injection.py --excel "./OMR Monthly Expense 2025-26.xlsx"
 """
 import os
+import re
 import argparse
-import pickle
+import itertools
+from pathlib import Path
 from dotenv import load_dotenv
 load_dotenv()
 import pandas as pd
 import gspread
+import pyarrow.feather as feather
+import orjson
 
 def sheets_to_dfs(sheet_ids, service_account_json):
-    gc = gspread.service_account_from_dict(eval(service_account_json))
+    gc = gspread.service_account_from_dict(orjson.loads(service_account_json))
     dfs = []
     for sid in [s.strip() for s in sheet_ids.split(",") if s.strip()]:
         sh = gc.open_by_key(sid)
-        for ws in sh.worksheets():
-            vals = ws.get_all_values()
+        worksheets = sh.worksheets()
+        # one values.batchGet round-trip per spreadsheet instead of one
+        # HTTPS call per worksheet
+        ranges = ["'{}'".format(ws.title.replace("'", "''")) for ws in worksheets]
+        resp = sh.values_batch_get(ranges)
+        for ws, vrange in zip(worksheets, resp.get("valueRanges", [])):
+            vals = vrange.get("values", [])
             if not vals or len(vals) < 2:
                 continue
             header = [str(c).strip() for c in vals[0]]
             if len(set(header)) != len(header) or '' in header:
                 continue
-            rows = [r for r in vals[1:] if len(r) == len(header)]
-            df = pd.DataFrame(rows, columns=header)
+            df = coerce_dtypes(rows_to_df(vals[1:], header))
             dfs.append((sh.title + " → " + ws.title, df))
     return dfs
 
+def rows_to_df(rows, header):
+    """Build a DataFrame column-by-column (pandas' native layout) instead of
+    handing pandas a list of rows it has to transpose. Ragged rows are padded
+    with None rather than dropped."""
+    cols = list(itertools.zip_longest(*rows, fillvalue=None))
+    # the API trims trailing empty cells, so every row can be shorter than the
+    # header; emit empty columns for the trailing headers instead of dropping them
+    if len(cols) < len(header):
+        cols.extend([(None,) * len(rows)] * (len(header) - len(cols)))
+    return pd.DataFrame(dict(zip(header, cols)))
+
+_DATE_RE = re.compile(r"^\s*(?:\d{4}-\d{1,2}-\d{1,2}|\d{1,2}[/-]\d{1,2}[/-]\d{2,4})")
+
+def coerce_dtypes(df):
+    """Sheets deliver every cell as a string. Convert columns to numeric or
+    datetime here, once, so the Feather bundle ships typed columns: they are
+    far smaller than per-cell Python strings and downstream arithmetic stays
+    vectorized instead of re-parsing strings on every query."""
+    for c in df.columns:
+        col = df[c]
+        # pandas 3 gives string data the new str dtype rather than object, so
+        # a plain object check would skip every column there
+        if not (pd.api.types.is_object_dtype(col) or pd.api.types.is_string_dtype(col)):
+            continue
+        cleaned = col.replace("", None)
+        try:
+            df[c] = pd.to_numeric(cleaned)
+            continue
+        except (ValueError, TypeError):
+            pass
+        nonempty = cleaned.dropna()
+        if not nonempty.empty and _DATE_RE.match(str(nonempty.iloc[0])):
+            try:
+                df[c] = pd.to_datetime(cleaned)
+            except (ValueError, TypeError):
+                pass
+    return df
+
 def excel_to_dfs(path):
     xls = pd.ExcelFile(path)
     dfs = []
@@ -44,11 +95,31 @@ def excel_to_dfs(path):
         dfs.append((sheet, df))
     return dfs
 
+def feather_safe(df):
+    """Feather rejects mixed-type object columns (e.g. the int/str 'By' column
+    read_excel yields from OMR.xlsx) with ArrowInvalid. Cast any residual
+    object column to pandas' string dtype, which keeps missing values intact
+    and serializes cleanly."""
+    for c in df.columns:
+        if pd.api.types.is_object_dtype(df[c]):
+            df[c] = df[c].astype("string")
+    return df
+
+def write_injection(dfs, out_dir):
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    manifest = []
+    for i, (name, df) in enumerate(dfs):
+        fname = f"table_{i:03d}.feather"
+        feather.write_feather(feather_safe(df), str(out / fname), compression="lz4")
+        manifest.append({"name": name, "file": fname})
+    (out / "manifest.json").write_bytes(orjson.dumps(manifest))
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--sheets", help="comma separated sheet ids")
     parser.add_argument("--excel", help="local excel file path")
-    parser.add_argument("--out", help="output pickle path", default="injected_dfs.pkl")
+    parser.add_argument("--out", help="output bundle directory", default="injected_dfs.arrow")
     args = parser.parse_args()
 
     if not args.sheets and not args.excel:
@@ -65,8 +136,7 @@ def main():
     else:
         dfs = excel_to_dfs(args.excel)
 
-    with open(args.out, "wb") as fh:
-        pickle.dump(dfs, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    write_injection(dfs, args.out)
 
     print("Wrote", args.out, "with", len(dfs), "worksheets")
 
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Sandbox controller:
-  python3 sandbox.py path/to/untrusted_script.py [path/to/injected_dfs.pkl]
+  python3 sandbox.py path/to/untrusted_script.py [path/to/injected_dfs.arrow]
 
 Copies files into a temp directory and runs child_runner.py there.
 Captures stdout/stderr and enforces wall timeout.
@@ -16,8 +16,16 @@ import os
 WALL_TIMEOUT = 20  # seconds
 PYTHON_BIN = sys.executable
 
+def _link_or_copy(src, dst):
+    # hardlink when on the same filesystem: no bytes moved regardless of
+    # injection size; fall back to a real copy across devices
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
 if len(sys.argv) < 2:
-    print("Usage: python3 sandbox.py <script.py> [injected_dfs.pkl]")
+    print("Usage: python3 sandbox.py <script.py> [injected_dfs.arrow]")
     sys.exit(2)
 
 target = Path(sys.argv[1]).resolve()
@@ -32,25 +40,42 @@ if len(sys.argv) >= 3:
         print("Injection file not found:", inject_src)
         sys.exit(2)
 
-tmpdir = Path(tempfile.mkdtemp(prefix="runsandbox_"))
+# back the sandbox with tmpfs when available — no page-cache writeback cost
+_tmp_base = "/dev/shm" if os.path.isdir("/dev/shm") else None
+tmpdir = Path(tempfile.mkdtemp(prefix="runsandbox_", dir=_tmp_base))
 try:
     target_copy = tmpdir / target.name
-    shutil.copy2(target, target_copy)
+    _link_or_copy(target, target_copy)
 
     if inject_src:
-        inject_dest = tmpdir / "injected_dfs.pkl"
-        shutil.copy2(inject_src, inject_dest)
+        inject_dest = tmpdir / "injected_dfs.arrow"
+        shutil.copytree(inject_src, inject_dest, copy_function=_link_or_copy)
 
     child_runner = Path(__file__).parent.resolve() / "child_runner.py"
     cmd = [PYTHON_BIN, str(child_runner), str(target_copy)]
 
+    # filter the env here rather than having the child unsetenv key-by-key:
+    # the child starts with a small environ block and never rescans it
+    child_env = {
+        k: v for k, v in os.environ.items()
+        if not k.startswith("LD_") and k not in ("PYTHONPATH", "PYTHONHOME")
+    }
+
     try:
+        # keep the pipes in bytes mode and forward them raw: decoding to str
+        # and re-encoding on print doubles the work for large child output
+        #
+        # the default close_fds=True keeps this on the fork+exec path on
+        # Python 3.11 (posix_spawn there requires close_fds=False, which we
+        # won't grant a sandbox child); staying free of preexec_fn/pass_fds
+        # still lets newer CPythons take posix_spawn once they support it
+        # with closed fds
         proc = subprocess.run(
             cmd,
+            env=child_env,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             timeout=WALL_TIMEOUT,
-            text=True,
         )
     except subprocess.TimeoutExpired:
         print(f"[sandbox] Execution exceeded wall timeout of {WALL_TIMEOUT}s — killed.")
@@ -59,10 +84,14 @@ try:
 
     if proc.stdout:
         print("--- child stdout ---")
-        print(proc.stdout.rstrip())
+        sys.stdout.flush()
+        sys.stdout.buffer.write(proc.stdout.rstrip() + b"\n")
+        sys.stdout.buffer.flush()
     if proc.stderr:
-        print("--- child stderr ---")
-        print(proc.stderr.rstrip(), file=sys.stderr)
+        print("--- child stderr ---", file=sys.stderr)
+        sys.stderr.flush()
+        sys.stderr.buffer.write(proc.stderr.rstrip() + b"\n")
+        sys.stderr.buffer.flush()
 
     sys.exit(proc.returncode if proc.returncode is not None else 0)
 finally:
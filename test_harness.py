@@ -2,27 +2,31 @@
 #!/usr/bin/env python3
 """
 Headless harness for testing main.py logic in CI (Jules).
-- Loads injected_dfs.pkl
+- Loads the injected_dfs.arrow bundle
 - Simulates a natural language question
 - Runs through the run_query logic from main.py
 """
 
-import pickle
 import os
+import re
 import sys
 from pathlib import Path
 import requests
 
+from child_runner import load_injected
+
 # ---- Load injected DataFrames ----
-injected_path = Path("injected_dfs.pkl")
-if not injected_path.exists():
-    print("❌ injected_dfs.pkl not found. Run prepare_injection.py first.")
+injected_path = Path("injected_dfs.arrow")
+if not injected_path.is_dir():
+    print("❌ injected_dfs.arrow not found. Run prepare_injection.py first.")
     sys.exit(1)
 
-with open(injected_path, "rb") as f:
-    dfs = pickle.load(f)
+dfs = load_injected(str(injected_path))
 
 # ---- Functions from main.py ----
+# pooled session so repeated questions reuse the TLS connection
+_SESSION = requests.Session()
+
 def ask_llm_for_code(question, dfs):
     schema_parts = []
     for name, df in dfs:
@@ -50,7 +54,7 @@ Question:
     if not api_key:
         raise RuntimeError("Missing OPENROUTER_API_KEY in env")
 
-    resp = requests.post(
+    resp = _SESSION.post(
         "https://openrouter.ai/api/v1/chat/completions",
         headers={
             "Authorization": f"Bearer {api_key}",
@@ -65,9 +69,12 @@ Question:
     resp.raise_for_status()
     return resp.json()["choices"][0]["message"]["content"].strip()
 
+_BANNED_RE = re.compile(
+    r"import|os\.|system\(|open\(|eval\(|exec\(|subprocess", re.IGNORECASE
+)
+
 def is_safe_code(code):
-    banned = ["import", "os.", "system(", "open(", "eval(", "exec(", "subprocess"]
-    return not any(b in code.lower() for b in banned)
+    return _BANNED_RE.search(code) is None
 
 def run_query(question, dfs):
     code = ask_llm_for_code(question, dfs)
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""Quick checks for prepare_injection's dtype coercion (run with pytest)."""
+import pandas as pd
+
+from prepare_injection import coerce_dtypes
+
+
+def test_numeric_strings_round_trip_as_numeric():
+    # sheet cells arrive as strings with "" for blanks; the column must come
+    # back numeric with the blank as NA, on both pandas 2 (object dtype) and
+    # pandas 3 (str dtype)
+    df = coerce_dtypes(pd.DataFrame({"Amount": ["1", "2", ""]}))
+    assert pd.api.types.is_numeric_dtype(df["Amount"])
+    assert df["Amount"].isna().iloc[2]
+
+
+def test_non_numeric_column_left_alone():
+    df = coerce_dtypes(pd.DataFrame({"Note": ["lunch", "taxi", ""]}))
+    assert not pd.api.types.is_numeric_dtype(df["Note"])